@@ -1,12 +1,31 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import pymysql
+import redis.asyncio as redis
 
-pymysql.install_as_MySQLdb()
+DATABASE_URL = "mysql+aiomysql://root:@localhost/evote"
+REDIS_URL = "redis://localhost:6379/0"
 
-DATABASE_URL = "mysql+pymysql://root:@localhost/evote"
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+# Pool is per process: with `uvicorn --workers N` the server sees up to
+# N * (pool_size + max_overflow) connections, so keep that under MySQL's
+# max_connections (or put a connection proxy such as ProxySQL in front).
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=True,   # drop connections MySQL closed (wait_timeout)
+    pool_recycle=3600,
+    query_cache_size=1200,
+)
+# expire_on_commit=False: async sessions cannot lazy-load attributes after commit
+SessionLocal = sessionmaker(
+    bind=engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
+
+# Short timeouts so an unreachable Redis degrades to a cache miss instead of
+# stalling requests for the OS TCP timeout
+cache = redis.Redis.from_url(
+    REDIS_URL, decode_responses=True, socket_connect_timeout=0.1, socket_timeout=0.1
+)
@@ -0,0 +1,68 @@
+"""
+Creates the database tables. Run once per deployment, before starting the API:
+
+    python init_db.py
+    python init_db.py --create-admin admin@example.com   # prompts for the password
+    python init_db.py --migrate   # bring tables created by older versions up to date
+"""
+import argparse
+import asyncio
+import getpass
+
+from sqlalchemy import insert, inspect, text
+
+import models
+from database import SessionLocal, engine
+from security import hash_password
+
+
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+
+def migrate(conn):
+    """
+    Applies schema changes that create_all cannot make to existing tables
+    """
+    inspector = inspect(conn)
+
+    candidate_columns = {c["name"] for c in inspector.get_columns("candidates")}
+    if "vote_count" not in candidate_columns:
+        conn.execute(text("ALTER TABLE candidates ADD vote_count INT NOT NULL DEFAULT 0"))
+        conn.execute(text(
+            "UPDATE candidates c SET vote_count = "
+            "(SELECT COUNT(*) FROM votes v WHERE v.candidate_id = c.id)"
+        ))
+
+    # One ballot per voter; fails if the table already holds duplicate ballots
+    unique_keys = [c["column_names"] for c in inspector.get_unique_constraints("votes")]
+    unique_keys += [i["column_names"] for i in inspector.get_indexes("votes") if i["unique"]]
+    if ["voter_id"] not in unique_keys:
+        conn.execute(text("ALTER TABLE votes ADD UNIQUE KEY uq_votes_voter_id (voter_id)"))
+
+
+async def create_admin(email: str, password: str):
+    async with SessionLocal() as db:
+        await db.execute(insert(models.Admin).values(email=email, pass_field=hash_password(password)))
+        await db.commit()
+
+
+async def main(args):
+    try:
+        await init_db()
+        if args.migrate:
+            async with engine.begin() as conn:
+                await conn.run_sync(migrate)
+        if args.create_admin:
+            password = getpass.getpass(f"Password for {args.create_admin}: ")
+            await create_admin(args.create_admin, password)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the E-Voting database tables")
+    parser.add_argument("--migrate", action="store_true", help="upgrade tables created by older versions")
+    parser.add_argument("--create-admin", metavar="EMAIL", help="also add an admin with a bcrypt-hashed password")
+    asyncio.run(main(parser.parse_args()))
@@ -1,12 +1,48 @@
+import logging
+from contextlib import asynccontextmanager
+
+import orjson
 from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+import redis
+from sqlalchemy import insert, lambda_stmt, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 import models, schemas
-from database import engine, SessionLocal
+from database import SessionLocal, cache
+from security import verify_password
 from fastapi.middleware.cors import CORSMiddleware
 
-models.Base.metadata.create_all(bind=engine)
+BULK_INSERT_BATCH_SIZE = 50
+CACHE_TTL_SECONDS = 5
+
+logger = logging.getLogger("uvicorn.error")
+
+# Static body, so the response is built once and reused for every request
+ROOT_RESPONSE = ORJSONResponse({"message": "E-Voting System API is running 🚀"})
 
-app = FastAPI(title="E-Voting Machine API")
+def check_routes(app: FastAPI):
+    """
+    Warns when an endpoint is registered more than once (OpenAPI keeps only one per path and method)
+    """
+    handlers = sum(
+        len(route.methods) for route in app.routes
+        if isinstance(route, APIRoute) and route.include_in_schema
+    )
+    operations = sum(len(methods) for methods in app.openapi()["paths"].values())
+    if handlers != operations:
+        logger.warning("%d API handlers but %d OpenAPI operations; is a route registered twice?", handlers, operations)
+    else:
+        logger.info("Registered %d API operations", operations)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_routes(app)
+    yield
+
+app = FastAPI(title="E-Voting Machine API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Allow all origins (or specify your frontend URL)
 app.add_middleware(
@@ -15,35 +51,132 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # <- IMPORTANT: allows OPTIONS
     allow_headers=["*"],  # <- allows Content-Type, Authorization, etc.
+    max_age=86400,  # browsers cache preflights for a day instead of 10 minutes
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    # One pooled connection per request, shared by every dependency that asks for it
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def cache_get(key: str):
+    try:
+        cached = await cache.get(key)
+    except redis.RedisError:
+        return None
+    return orjson.loads(cached) if cached else None
+
+async def cache_set(key: str, value: dict):
+    try:
+        await cache.set(key, orjson.dumps(value), ex=CACHE_TTL_SECONDS)
+    except redis.RedisError:
+        pass
+
+async def cache_invalidate(*keys: str):
+    try:
+        await cache.delete(*keys)
+    except redis.RedisError:
+        pass
+
+# Lambda statements are built once and cached by code location; later calls
+# only swap in the bound parameter instead of rebuilding the select.
+def voter_by_nid(nid: str):
+    return lambda_stmt(lambda: select(models.Voter).where(models.Voter.nid == nid))
+
+def ballot_status_by_nid(nid: str):
+    return lambda_stmt(
+        lambda: select(models.Voter.id, models.Voter.name, models.Voter.has_voted).where(models.Voter.nid == nid)
+    )
+
+def admin_credentials_by_email(email: str):
+    return lambda_stmt(
+        lambda: select(models.Admin.email, models.Admin.pass_field).where(models.Admin.email == email)
+    )
+
+async def tally_votes(db: AsyncSession):
+    """
+    Returns (id, name, party, vote_count) for every candidate from the running tally
+    """
+    result = await db.execute(
+        select(
+            models.Candidate.id,
+            models.Candidate.name,
+            models.Candidate.party,
+            models.Candidate.vote_count,
+        ).order_by(models.Candidate.id)
+    )
+    return result.all()
 
 @app.get("/")
-def root():
-    return {"message": "E-Voting System API is running 🚀"}
+async def root():
+    return ROOT_RESPONSE
 
 
 @app.post("/voter/register")
-def register_voter(voter: schemas.VoterRegister, db: Session = Depends(get_db)):
-    existing_voter = db.query(models.Voter).filter(models.Voter.nid == voter.nid).first()
-    if existing_voter:
+async def register_voter(voter: schemas.VoterRegister, db: AsyncSession = Depends(get_db)):
+    # nid is UNIQUE, so the insert itself is the duplicate check
+    try:
+        await db.execute(
+            insert(models.Voter).values(nid=voter.nid, name=voter.name, birth_date=voter.birth_date)
+        )
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Voter already registered")
-
-    new_voter = models.Voter(nid=voter.nid, name=voter.name, birth_date=voter.birth_date)
-    db.add(new_voter)
-    db.commit()
-    db.refresh(new_voter)
+    await cache_invalidate("voterlist")
     return {"message": f"Voter {voter.name} registered successfully"}
 
+@app.post("/voter/register_bulk")
+async def register_voters_bulk(payload: schemas.VoterRegisterBulk, db: AsyncSession = Depends(get_db)):
+    """
+    Registers many voters at once, skipping NIDs that are already registered
+    """
+    # Keep the first occurrence of each NID within the request
+    pending = {}
+    for voter in payload.voters:
+        pending.setdefault(voter.nid, voter)
+    voters = list(pending.values())
+
+    registered = 0
+    for start in range(0, len(voters), BULK_INSERT_BATCH_SIZE):
+        batch = voters[start:start + BULK_INSERT_BATCH_SIZE]
+        existing = set(await db.scalars(
+            select(models.Voter.nid).where(models.Voter.nid.in_([v.nid for v in batch]))
+        ))
+        rows = [
+            {"nid": v.nid, "name": v.name, "birth_date": v.birth_date, "has_voted": False}
+            for v in batch if v.nid not in existing
+        ]
+        if not rows:
+            continue
+        try:
+            await db.execute(insert(models.Voter), rows)
+            await db.commit()
+            registered += len(rows)
+        except IntegrityError:
+            # Another request registered one of these NIDs after the SELECT;
+            # insert this batch row by row so only the duplicates are skipped
+            await db.rollback()
+            for row in rows:
+                try:
+                    await db.execute(insert(models.Voter).values(**row))
+                    await db.commit()
+                    registered += 1
+                except IntegrityError:
+                    await db.rollback()
+
+    if registered:
+        await cache_invalidate("voterlist")
+
+    return {
+        "message": f"{registered} voters registered successfully",
+        "registered": registered,
+        "skipped": len(payload.voters) - registered
+    }
+
 @app.get("/voter/check/{nid}")
-def check_voter_registration(nid: str, db: Session = Depends(get_db)):
-    voter = db.query(models.Voter).filter(models.Voter.nid == nid).first()
+async def check_voter_registration(nid: str, db: AsyncSession = Depends(get_db)):
+    voter = await db.scalar(voter_by_nid(nid))
     if not voter:
         raise HTTPException(status_code=404, detail="Voter not registered")
 
@@ -56,36 +189,51 @@ def check_voter_registration(nid: str, db: Session = Depends(get_db)):
     }
 
 @app.get("/voterlist")
-def voter_list(db: Session = Depends(get_db)):
+async def voter_list(db: AsyncSession = Depends(get_db)):
     """
     Returns the list of all registered voters
     """
-    voters = db.query(models.Voter).all()
-    if not voters:
+    cached = await cache_get("voterlist")
+    if cached:
+        return cached
+
+    # Server-side cursor: rows arrive in chunks instead of one materialized result set
+    rows = await db.stream(
+        select(
+            models.Voter.id,
+            models.Voter.nid,
+            models.Voter.name,
+            models.Voter.birth_date,
+            models.Voter.has_voted,
+        ).execution_options(yield_per=1000)
+    )
+    results = [
+        {
+            "id": row.id,
+            "nid": row.nid,
+            "name": row.name,
+            "birth_date": row.birth_date,
+            "has_voted": bool(row.has_voted)
+        }
+        async for row in rows
+    ]
+    if not results:
         return {"message": "No voters registered yet", "voters": []}
 
-    results = []
-    for voter in voters:
-        results.append({
-            "id": voter.id,
-            "nid": voter.nid,
-            "name": voter.name,
-            "birth_date": str(voter.birth_date) if voter.birth_date else None,
-            "has_voted": bool(voter.has_voted)
-        })
-
-    return {"voters": results}
+    response = {"voters": results}
+    await cache_set("voterlist", response)
+    return response
 
 
 @app.get("/candidate/{candidate_id}")
-def get_candidate(candidate_id: int, db: Session = Depends(get_db)):
+async def get_candidate(candidate_id: int, db: AsyncSession = Depends(get_db)):
     """
     Check if a specific candidate exists by ID
     """
-    candidate = db.query(models.Candidate).filter(models.Candidate.id == candidate_id).first()
+    candidate = await db.get(models.Candidate, candidate_id)
     if not candidate:
         raise HTTPException(status_code=404, detail="Candidate not found")
-    
+
     return {
         "id": candidate.id,
         "name": candidate.name,
@@ -93,44 +241,54 @@ def get_candidate(candidate_id: int, db: Session = Depends(get_db)):
     }
 
 @app.get("/candidates")
-def list_candidates(db: Session = Depends(get_db)):
+async def list_candidates(db: AsyncSession = Depends(get_db)):
     """
     List all registered candidates with vote counts
     """
-    candidates = db.query(models.Candidate).all()
-    if not candidates:
+    cached = await cache_get("candidates")
+    if cached:
+        return cached
+
+    rows = await tally_votes(db)
+    if not rows:
         return {"message": "No candidates registered yet", "candidates": []}
 
     results = []
-    for candidate in candidates:
-        vote_count = db.query(models.Vote).filter(models.Vote.candidate_id == candidate.id).count()
+    for candidate_id, name, party, vote_count in rows:
         results.append({
-            "id": candidate.id,
-            "name": candidate.name,
-            "party": candidate.party,
+            "id": candidate_id,
+            "name": name,
+            "party": party,
             "vote_count": vote_count
         })
 
-    return {"candidates": results}
-
-
-
-
+    response = {"candidates": results}
+    await cache_set("candidates", response)
+    return response
 
 
 @app.post("/admin/login")
-def admin_login(admin: schemas.AdminLogin, db: Session = Depends(get_db)):
+async def admin_login(admin: schemas.AdminLogin, db: AsyncSession = Depends(get_db)):
     # Search admin by email
-    db_admin = db.query(models.Admin).filter(models.Admin.email == admin.email).first()
+    db_admin = (await db.execute(admin_credentials_by_email(admin.email))).first()
 
     # If no admin found
     if not db_admin:
         raise HTTPException(status_code=404, detail="Admin not found ❌")
 
-    # If password doesn’t match
-    if db_admin.pass_field != admin.password:
+    # If password doesn’t match (constant-time hash comparison; bcrypt is
+    # CPU-bound, so keep it off the event loop)
+    valid, new_hash = await run_in_threadpool(verify_password, admin.password, db_admin.pass_field)
+    if not valid:
         raise HTTPException(status_code=401, detail="Incorrect password ❌")
 
+    # Upgrade legacy plaintext passwords to bcrypt
+    if new_hash:
+        await db.execute(
+            update(models.Admin).where(models.Admin.email == db_admin.email).values(pass_field=new_hash)
+        )
+        await db.commit()
+
     # Success
     return {
         "message": "Admin login successful ✅",
@@ -138,46 +296,67 @@ def admin_login(admin: schemas.AdminLogin, db: Session = Depends(get_db)):
     }
 
 @app.post("/candidate/add")
-def add_candidate(candidate: schemas.CandidateCreate, db: Session = Depends(get_db)):
-    new_candidate = models.Candidate(name=candidate.name, party=candidate.party)
-    db.add(new_candidate)
-    db.commit()
-    db.refresh(new_candidate)
+async def add_candidate(candidate: schemas.CandidateCreate, db: AsyncSession = Depends(get_db)):
+    await db.execute(insert(models.Candidate).values(name=candidate.name, party=candidate.party))
+    await db.commit()
+    await cache_invalidate("results", "candidates")
     return {"message": f"Candidate {candidate.name} added successfully"}
 
 
-
-
 @app.post("/vote/{nid}/{candidate_id}")
-def vote(nid: str, candidate_id: int, db: Session = Depends(get_db)):
-    voter = db.query(models.Voter).filter(models.Voter.nid == nid).first()
+async def vote(nid: str, candidate_id: int, db: AsyncSession = Depends(get_db)):
+    voter = (await db.execute(ballot_status_by_nid(nid))).first()
     if not voter:
         raise HTTPException(status_code=404, detail="Voter not found")
 
     if voter.has_voted:
         raise HTTPException(status_code=400, detail="Voter has already voted")
 
-    candidate = db.query(models.Candidate).filter(models.Candidate.id == candidate_id).first()
+    candidate = await db.get(models.Candidate, candidate_id)
     if not candidate:
         raise HTTPException(status_code=404, detail="Candidate not found")
 
-    new_vote = models.Vote(voter_id=voter.id, candidate_id=candidate.id)
-    db.add(new_vote)
-    voter.has_voted = True
-    db.commit()
+    # Claim the ballot atomically: only one concurrent request can flip has_voted
+    claimed = await db.execute(
+        update(models.Voter)
+        .where(models.Voter.id == voter.id, models.Voter.has_voted.is_not(True))
+        .values(has_voted=True)
+    )
+    if claimed.rowcount == 0:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Voter has already voted")
+
+    # The Core insert runs immediately, so the UNIQUE voter_id check fires here, not at commit
+    try:
+        await db.execute(insert(models.Vote).values(voter_id=voter.id, candidate_id=candidate.id))
+        # Increment in the database so concurrent votes cannot lose updates
+        await db.execute(
+            update(models.Candidate)
+            .where(models.Candidate.id == candidate.id)
+            .values(vote_count=models.Candidate.vote_count + 1)
+        )
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Voter has already voted")
+    await cache_invalidate("results", "candidates", "voterlist")
 
     return {"message": f"{voter.name} successfully voted for {candidate.name}"}
 
 
 @app.get("/results")
-def get_results(db: Session = Depends(get_db)):
-    candidates = db.query(models.Candidate).all()
+async def get_results(db: AsyncSession = Depends(get_db)):
+    cached = await cache_get("results")
+    if cached:
+        return cached
+
     results = []
-    for candidate in candidates:
-        vote_count = db.query(models.Vote).filter(models.Vote.candidate_id == candidate.id).count()
+    for _, name, party, vote_count in await tally_votes(db):
         results.append({
-            "candidate": candidate.name,
-            "party": candidate.party,
+            "candidate": name,
+            "party": party,
             "votes": vote_count
         })
-    return {"results": results}
+    response = {"results": results}
+    await cache_set("results", response)
+    return response
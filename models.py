@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 
 class Voter(Base):
     __tablename__ = "voters"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)  # PK is already the clustered index
     nid = Column(String(20), unique=True, index=True)        # length 20
     name = Column(String(100), nullable=False)              # length 100
     birth_date = Column(String(10), nullable=False)         # YYYY-MM-DD format
@@ -12,16 +12,19 @@ class Voter(Base):
 
 class Candidate(Base):
     __tablename__ = "candidates"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)              # length 100
     party = Column(String(50), nullable=False)              # length 50
+    vote_count = Column(Integer, default=0, server_default="0", nullable=False)  # kept in step with votes
     votes = relationship("Vote", back_populates="candidate")
 
 class Vote(Base):
     __tablename__ = "votes"
-    id = Column(Integer, primary_key=True, index=True)
+    # One ballot per voter. Named explicitly: MySQL already calls the implicit FK index "voter_id"
+    __table_args__ = (UniqueConstraint("voter_id", name="uq_votes_voter_id"),)
+    id = Column(Integer, primary_key=True)
     voter_id = Column(Integer, ForeignKey("voters.id"))
-    candidate_id = Column(Integer, ForeignKey("candidates.id"))
+    candidate_id = Column(Integer, ForeignKey("candidates.id"), index=True)
 
     voter = relationship("Voter")
     candidate = relationship("Candidate", back_populates="votes")
@@ -30,6 +33,6 @@ class Vote(Base):
 class Admin(Base):
     __tablename__ = "admin"
 
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String(200), unique=True, nullable=False)
+    id = Column(Integer, primary_key=True)
+    email = Column(String(200), unique=True, index=True, nullable=False)
     pass_field = Column("pass", String(200), nullable=False)  
@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel
 
 class VoterRegister(BaseModel):
@@ -5,6 +7,9 @@ class VoterRegister(BaseModel):
     name: str
     birth_date: str
 
+class VoterRegisterBulk(BaseModel):
+    voters: List[VoterRegister]
+
 class CandidateCreate(BaseModel):
     name: str
     party: str
@@ -0,0 +1,35 @@
+import hmac
+import re
+
+import bcrypt
+
+# bcrypt only looks at the first 72 bytes; current releases raise instead of truncating
+BCRYPT_MAX_BYTES = 72
+BCRYPT_HASH = re.compile(r"\$2[abxy]\$\d\d\$[./A-Za-z0-9]{53}")
+
+
+def hash_password(password: str) -> str:
+    encoded = password.encode("utf-8")
+    if len(encoded) > BCRYPT_MAX_BYTES:
+        raise ValueError(f"Password must be at most {BCRYPT_MAX_BYTES} bytes")
+    return bcrypt.hashpw(encoded, bcrypt.gensalt()).decode("ascii")
+
+
+def verify_password(password: str, hashed: str):
+    """
+    Returns (is_valid, new_hash); new_hash is set when a legacy plaintext row should be upgraded
+    """
+    encoded = password.encode("utf-8")
+    if len(encoded) > BCRYPT_MAX_BYTES:
+        return False, None
+
+    if BCRYPT_HASH.fullmatch(hashed):
+        try:
+            return bcrypt.checkpw(encoded, hashed.encode("ascii")), None
+        except ValueError:
+            pass  # not a usable hash after all; treat it as a legacy plaintext row
+
+    # Rows created before hashing store the password as-is
+    if hmac.compare_digest(encoded, hashed.encode("utf-8")):
+        return True, hash_password(password)
+    return False, None